@@ -2,10 +2,24 @@ import pygame
 import sys
 import random
 import math
+import time
+import gc
+import tracemalloc
+import itertools
+import collections
+from array import array
 
 # -------------------------------------------------
 # INITIALIZATION & CONSTANTS
 # -------------------------------------------------
+# Audio: a small mixer buffer keeps input-to-sound latency low
+# (AUDIO_BUFFER / AUDIO_FREQ seconds, ~11.6 ms at 256 / 22050)
+AUDIO_FREQ = 22050
+AUDIO_BUFFER = 256
+AUDIO_CHANNELS = 8
+AUDIO_RESERVED = 2  # 0 = music, 1 = player voice (jump/death)
+
+pygame.mixer.pre_init(AUDIO_FREQ, -16, 1, AUDIO_BUFFER)
 pygame.init()
 pygame.display.set_caption("AC HOLDING'S SMB")
 
@@ -74,6 +88,208 @@ class Camera:
         
         self.camera = pygame.Rect(x, 0, self.width, self.height)
 
+# -------------------------------------------------
+# PARTICLES
+# -------------------------------------------------
+# Kinds: (color, size, gravity, life in frames, speed)
+P_COIN, P_DEBRIS, P_PUFF, P_SPARK, P_HIT = range(5)
+PARTICLE_KINDS = (
+    (GOLD, 8, 0.6, 24, 9),
+    (BRICK_BROWN, 6, 0.6, 45, 5),
+    ((220, 220, 220), 6, 0.0, 18, 2),
+    ((255, 140, 0), 4, 0.3, 40, 6),
+    (WHITE, 5, 0.0, 30, 4),
+)
+PARTICLE_CAPACITY = 4096
+DEATH_FREEZE_FRAMES = 45  # frames of a death transition spent on the level, not the card
+
+class ParticlePool:
+    """
+    Fixed-capacity particle storage. Every field lives in a preallocated
+    array slot, so emitting or expiring a particle never creates an object.
+    Dead particles are swap-removed to keep the live range [0, count) dense.
+    Each slot also owns a reusable [sprite, Rect] blit entry, so drawing only
+    rewrites coordinates in place.
+    """
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.x = array('f', bytes(4 * capacity))
+        self.y = array('f', bytes(4 * capacity))
+        self.vx = array('f', bytes(4 * capacity))
+        self.vy = array('f', bytes(4 * capacity))
+        self.life = array('h', bytes(2 * capacity))
+        self.kind = array('B', bytes(capacity))
+        self.gravity = tuple(k[2] for k in PARTICLE_KINDS)
+
+        # One pre-rendered surface per kind, shared by every particle
+        self.sprites = []
+        for color, size, _, _, _ in PARTICLE_KINDS:
+            surf = pygame.Surface((size, size))
+            surf.fill(color)
+            self.sprites.append(surf)
+        self.entries = [[self.sprites[0], pygame.Rect(0, 0, 0, 0)] for _ in range(capacity)]
+
+    def emit(self, kind, x, y, n):
+        _, size, _, life, speed = PARTICLE_KINDS[kind]
+        n = min(n, self.capacity - self.count)
+        i = self.count
+        for _ in range(n):
+            if kind == P_COIN:
+                vx, vy = 0.0, -speed
+            elif kind == P_DEBRIS:
+                vx, vy = random.uniform(-speed, speed), random.uniform(-2 * speed, -speed)
+            else:
+                a = random.uniform(0, math.tau)
+                s = random.uniform(0.3, 1.0) * speed
+                vx, vy = math.cos(a) * s, math.sin(a) * s
+            self.x[i] = x - size / 2
+            self.y[i] = y - size / 2
+            self.vx[i] = vx
+            self.vy[i] = vy
+            self.life[i] = life
+            self.kind[i] = kind
+            self.entries[i][0] = self.sprites[kind]
+            i += 1
+        self.count = i
+
+    def clear(self):
+        self.count = 0
+
+    def update(self):
+        x, y, vx, vy, life, kind = self.x, self.y, self.vx, self.vy, self.life, self.kind
+        entries = self.entries
+        grav = self.gravity
+        n = self.count
+        i = 0
+        while i < n:
+            l = life[i] - 1
+            if l <= 0:
+                n -= 1
+                x[i] = x[n]; y[i] = y[n]
+                vx[i] = vx[n]; vy[i] = vy[n]
+                life[i] = life[n]; kind[i] = kind[n]
+                entries[i], entries[n] = entries[n], entries[i]
+                continue
+            life[i] = l
+            v = vy[i] + grav[kind[i]]
+            vy[i] = v
+            x[i] += vx[i]
+            y[i] += v
+            i += 1
+        self.count = n
+
+    def draw(self, screen, cam):
+        if not self.count:
+            return
+        ox, oy = cam.camera.topleft
+        x, y, entries = self.x, self.y, self.entries
+        for i in range(self.count):
+            r = entries[i][1]
+            r.x = int(x[i]) + ox
+            r.y = int(y[i]) + oy
+        screen.blits(itertools.islice(entries, self.count), False)
+
+particles = ParticlePool()
+
+# -------------------------------------------------
+# AUDIO
+# -------------------------------------------------
+# Effects: list of (start_hz, end_hz, seconds, wave); 0 Hz is a rest
+SFX_DEFS = {
+    "jump":   [(330, 880, 0.15, "square")],
+    "coin":   [(988, 988, 0.06, "square"), (1319, 1319, 0.25, "square")],
+    "bump":   [(110, 80, 0.06, "square")],
+    "stomp":  [(400, 100, 0.08, "noise")],
+    "death":  [(494, 494, 0.12, "square"), (0, 0, 0.08, "square"),
+               (494, 247, 0.5, "square")],
+    "clear":  [(523, 523, 0.1, "square"), (659, 659, 0.1, "square"),
+               (784, 784, 0.1, "square"), (1047, 1047, 0.35, "square")],
+}
+
+# Music: (note frequencies, seconds per note, wave), looped on the music channel
+MUSIC_DEFS = {
+    "overworld":   ([659, 659, 0, 659, 0, 523, 659, 0, 784, 0, 0, 0, 392, 0, 0, 0], 0.12, "square"),
+    "underground": ([131, 262, 110, 220, 117, 233, 0, 0, 87, 175, 73, 147, 78, 156, 0, 0], 0.14, "square"),
+    "sky":         ([523, 659, 784, 659, 587, 698, 880, 698, 523, 659, 784, 1047, 784, 0, 0, 0], 0.14, "tri"),
+    "castle":      ([147, 156, 147, 0, 139, 147, 139, 0, 131, 139, 131, 0, 123, 131, 117, 0], 0.12, "tri"),
+}
+
+class AudioEngine:
+    """
+    Synthesizes every effect and theme loop into an in-memory Sound bank at
+    startup, so play() is a channel dispatch with no disk reads or decoding.
+    Silently disabled when the mixer could not be opened.
+    """
+    def __init__(self):
+        self.bank = {}
+        self.music = {}
+        self.current_music = None
+        self.enabled = pygame.mixer.get_init() is not None
+        if not self.enabled:
+            return
+        self.freq, _, self.out_channels = pygame.mixer.get_init()
+        pygame.mixer.set_num_channels(AUDIO_CHANNELS)
+        pygame.mixer.set_reserved(AUDIO_RESERVED)
+        self.music_channel = pygame.mixer.Channel(0)
+        self.voice_channel = pygame.mixer.Channel(1)
+
+        for name, segments in SFX_DEFS.items():
+            self.bank[name] = self.synth(segments, 0.25)
+        for theme, (notes, dur, wave) in MUSIC_DEFS.items():
+            self.music[theme] = self.synth([(f, f, dur, wave) for f in notes], 0.08)
+
+    def synth(self, segments, volume):
+        amp = int(32767 * volume)
+        samples = array('h')
+        phase = 0.0
+        for f0, f1, dur, wave in segments:
+            n = int(self.freq * dur)
+            for i in range(n):
+                f = f0 + (f1 - f0) * i / n
+                phase = (phase + f / self.freq) % 1.0
+                if f == 0:
+                    v = 0
+                elif wave == "noise":
+                    v = amp if random.random() < 0.5 else -amp
+                elif wave == "tri":
+                    v = int(amp * (4 * abs(phase - 0.5) - 1))
+                else:
+                    v = amp if phase < 0.5 else -amp
+                # Short linear fade at both ends to avoid clicks
+                edge = min(i, n - 1 - i)
+                if edge < 64:
+                    v = v * edge // 64
+                samples.append(v)
+        if self.out_channels > 1:
+            stereo = array('h', bytes(2 * len(samples) * self.out_channels))
+            for c in range(self.out_channels):
+                stereo[c::self.out_channels] = samples
+            samples = stereo
+        return pygame.mixer.Sound(buffer=samples.tobytes())
+
+    def play(self, name):
+        if not self.enabled:
+            return
+        if name in ("jump", "death"):
+            self.voice_channel.play(self.bank[name])
+        else:
+            self.bank[name].play()
+
+    def play_music(self, theme):
+        if not self.enabled or self.current_music == theme:
+            return
+        self.current_music = theme
+        self.music_channel.play(self.music[theme], loops=-1)
+
+    def stop_music(self):
+        if not self.enabled:
+            return
+        self.current_music = None
+        self.music_channel.stop()
+
+audio = AudioEngine()
+
 # -------------------------------------------------
 # ENTITIES
 # -------------------------------------------------
@@ -127,6 +343,7 @@ class Player(Entity):
         if keys[pygame.K_SPACE] and self.on_ground:
             self.vy = JUMP_POWER
             self.on_ground = False
+            audio.play("jump")
 
         # Gravity
         self.vy += GRAVITY
@@ -154,19 +371,20 @@ class Player(Entity):
             elif self.vy < 0:
                 self.rect.top = block.rect.bottom
                 self.vy = 0
-                if isinstance(block, Block) and block.type == "question":
+                if isinstance(block, Block):
+                    if block.type == "question":
+                        self.score += 100
+                        self.coins += 1
                     block.hit()
-                    self.score += 100
-                    self.coins += 1
 
         # --- Hazards (Lava/Pits) ---
         for hazard in hazards:
             if self.rect.colliderect(hazard):
-                self.die()
+                self.die("lava")
                 break
 
         if self.rect.y > SCREEN_HEIGHT + 100:
-            self.die()
+            self.die("pit")
 
         # --- Enemy Collision ---
         if self.iframe_timer == 0:
@@ -174,6 +392,7 @@ class Player(Entity):
             for e in e_hits:
                 if self.vy > 0 and self.rect.bottom < e.rect.centery + 20:
                     e.die()
+                    audio.play("stomp")
                     self.vy = BOUNCE_POWER
                     self.score += 200
                 else:
@@ -188,12 +407,21 @@ class Player(Entity):
                         self.die()
                         break
 
-    def die(self):
+    def die(self, cause="hit"):
         if self.iframe_timer > 0:
             return
         self.dead = True
         self.lives -= 1
         self.iframe_timer = 60
+        if cause == "lava":
+            particles.emit(P_SPARK, self.rect.centerx, self.rect.centery, 32)
+        elif cause == "pit":
+            # The player is already off screen; burst from the bottom edge
+            particles.emit(P_HIT, self.rect.centerx, SCREEN_HEIGHT - 10, 16)
+        else:
+            particles.emit(P_HIT, self.rect.centerx, self.rect.centery, 16)
+        audio.stop_music()
+        audio.play("death")
 
     def draw(self, screen, cam):
         rect = cam.apply(self)
@@ -220,6 +448,8 @@ class Block(Entity):
     def __init__(self, x, y, w, h, color, btype="normal"):
         super().__init__(x, y, w, h, color)
         self.type = btype
+        self.original_type = btype
+        self.original_color = color
         self.original_y = y
         self.bump_timer = 0
     
@@ -228,13 +458,90 @@ class Block(Entity):
             self.type = "empty"
             self.color = (139, 69, 19) 
             self.bump_timer = 10
+            active_blocks.add(self)
+            particles.emit(P_COIN, self.rect.centerx, self.rect.top, 1)
+            audio.play("coin")
+        elif self.type == "normal":
+            self.bump_timer = 10
+            active_blocks.add(self)
+            particles.emit(P_DEBRIS, self.rect.centerx, self.rect.top, 4)
+            audio.play("bump")
     
     def update(self):
+        # Returns True while the bump animation is still running
         if self.bump_timer > 0:
             self.rect.y = self.original_y - 10
             self.bump_timer -= 1
-        else:
-            self.rect.y = self.original_y
+            return True
+        self.rect.y = self.original_y
+        return False
+
+    def reset(self):
+        self.type = self.original_type
+        self.color = self.original_color
+        self.bump_timer = 0
+        self.rect.y = self.original_y
+
+class ActiveBlockSet:
+    """
+    Blocks that are currently animating. Block.hit registers a block, update()
+    ticks only the registered ones and drops each block once it settles, so
+    blocks at rest cost nothing per frame. Listeners are called as
+    listener(block, active) when a block starts or stops animating, letting
+    any cached render or collision index refresh just that block.
+
+    `touched` holds every block hit since the level loaded, i.e. the only
+    blocks that differ from the generated level; snapshots store just these.
+    Both are dicts used as insertion-ordered sets for O(1) membership.
+    """
+    def __init__(self):
+        self.blocks = {}
+        self.touched = {}
+        self.listeners = []
+
+    def add(self, block):
+        self.touched[block] = None
+        if block in self.blocks:
+            return
+        self.blocks[block] = None
+        for listener in self.listeners:
+            listener(block, True)
+
+    def update(self):
+        if not self.blocks:
+            return
+        settled = [b for b in self.blocks if not b.update()]
+        for block in settled:
+            del self.blocks[block]
+            for listener in self.listeners:
+                listener(block, False)
+
+    def clear(self):
+        # Put touched blocks back to their generated state so any snapshot
+        # still referencing this level can re-apply its own delta
+        for block in self.touched:
+            block.reset()
+            if block in self.blocks:
+                for listener in self.listeners:
+                    listener(block, False)
+        self.blocks.clear()
+        self.touched.clear()
+
+    def restore(self, entries):
+        # entries: (block, type, color, bump_timer, y) as stored by snapshot_game
+        self.clear()
+        for block, btype, color, bump_timer, y in entries:
+            block.type = btype
+            block.color = color
+            block.bump_timer = bump_timer
+            block.rect.y = y
+            self.touched[block] = None
+            if bump_timer > 0:
+                self.blocks[block] = None
+                for listener in self.listeners:
+                    listener(block, True)
+
+active_blocks = ActiveBlockSet()
 
 class Enemy(Entity):
     def __init__(self, x, y, w, h, color, speed):
@@ -271,6 +578,7 @@ class Enemy(Entity):
     def die(self):
         self.alive = False
         self.kill()
+        particles.emit(P_PUFF, self.rect.centerx, self.rect.centery, 10)
 
 class Goomba(Enemy):
     def __init__(self, x, y):
@@ -574,46 +882,328 @@ def generate_level_data(abs_level_idx):
     return platforms, enemies, hazards, bg_color, width, goal_rect, theme
 
 # -------------------------------------------------
-# GAME LOOPS & STATES
+# SNAPSHOTS
 # -------------------------------------------------
-def main():
-    clock = pygame.time.Clock()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    
-    # Game Variables
-    level = 1
-    player = Player(100, 100)
-    
-    # Level State
-    platforms = pygame.sprite.Group()
-    enemies = pygame.sprite.Group()
-    hazards = []
-    bg_color = SKY_BLUE
-    level_width = 0
-    goal_rect = None
-    current_theme = "overworld"
-    
-    # Camera
-    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+def snapshot_game(player, level_data, roster, state, level, transition_timer):
+    """
+    Returns an immutable snapshot of the running game:
+    (player, level_data, roster, blocks, enemies, state, level, transition_timer, rng)
+    level_data (the generate_level_data tuple) and roster (every enemy the
+    level spawned) are shared by reference, not copied. Only blocks listed in
+    active_blocks.touched are stored, as (block, type, color, bump_timer, y).
+    Particles and audio are cosmetic and not captured.
+    """
+    r = player.rect
+    enemies = level_data[1]
+    enemy_states = []
+    for e in roster:
+        extra = None
+        if isinstance(e, Bowser):
+            extra = (e.timer, e.jump_timer, tuple(tuple(f) for f in e.fireballs))
+        enemy_states.append((e, e in enemies, e.rect.x, e.rect.y, e.vx, e.vy, e.alive, extra))
+    return (
+        (r.x, r.y, player.vx, player.vy, player.on_ground, player.facing_right,
+         player.dead, player.lives, player.coins, player.score,
+         player.iframe_timer, player.invincible),
+        level_data,
+        roster,
+        tuple((b, b.type, b.color, b.bump_timer, b.rect.y) for b in active_blocks.touched),
+        tuple(enemy_states),
+        state,
+        level,
+        transition_timer,
+        random.getstate(),
+    )
+
+def restore_snapshot(snapshot, player):
+    """
+    Applies a snapshot_game() snapshot to `player`, the level's blocks and
+    enemies and the RNG. Returns (level_data, roster, state, level,
+    transition_timer) for the caller to reinstall.
+    """
+    p, level_data, roster, blocks, enemy_states, state, level, transition_timer, rng = snapshot
+
+    (player.rect.x, player.rect.y, player.vx, player.vy, player.on_ground,
+     player.facing_right, player.dead, player.lives, player.coins,
+     player.score, player.iframe_timer, player.invincible) = p
+
+    active_blocks.restore(blocks)
+
+    # Rebuild the group in roster order: re-adding killed enemies at the end
+    # would change update and collision order and break deterministic replay
+    enemies = level_data[1]
+    enemies.empty()
+    enemies.add(*[e for e, in_group, *_ in enemy_states if in_group])
+    for e, in_group, x, y, vx, vy, alive, extra in enemy_states:
+        e.rect.x = x
+        e.rect.y = y
+        e.vx = vx
+        e.vy = vy
+        e.alive = alive
+        if extra:
+            e.timer, e.jump_timer, fireballs = extra
+            e.fireballs[:] = [pygame.Rect(f) for f in fireballs]
+
+    random.setstate(rng)
+    return level_data, roster, state, level, transition_timer
 
-    def load_level(lvl_idx):
-        nonlocal platforms, enemies, hazards, bg_color, level_width, goal_rect, camera, current_theme
-        platforms, enemies, hazards, bg_color, level_width, goal_rect, current_theme = generate_level_data(lvl_idx)
-        camera = Camera(level_width, SCREEN_HEIGHT)
+# -------------------------------------------------
+# GAME SESSION
+# -------------------------------------------------
+class GameSession:
+    """
+    Everything the game keeps across load_level calls: the player, the
+    installed level, the state machine, the camera and the quick-save slot.
+    main() drives it from input and draws it; soak_levels drives the same
+    transitions headless.
+    """
+    def __init__(self, mem_tracker=None):
+        self.player = Player(100, 100)
+        self.level = 1
+        self.state = "MENU"
+        self.transition_timer = 0
+        self.quick_save = None
+        self.mem_tracker = mem_tracker
+
+        # Level State
+        self.level_data = None
+        self.roster = []
+        self.platforms = pygame.sprite.Group()
+        self.enemies = pygame.sprite.Group()
+        self.hazards = []
+        self.bg_color = SKY_BLUE
+        self.level_width = 0
+        self.goal_rect = None
+        self.current_theme = "overworld"
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def install_level(self, data, roster):
+        self.level_data, self.roster = data, roster
+        (self.platforms, self.enemies, self.hazards, self.bg_color,
+         self.level_width, self.goal_rect, self.current_theme) = data
+        self.camera = Camera(self.level_width, SCREEN_HEIGHT)
+
+    def load_level(self, lvl_idx):
+        data = generate_level_data(lvl_idx)
+        self.install_level(data, list(data[1]))
+        player = self.player
         player.rect.x = 100
         player.rect.y = 100
         player.vx = 0
         player.vy = 0
         player.dead = False
         player.iframe_timer = 0
+        particles.clear()
+        active_blocks.clear()
+        audio.play_music(self.current_theme)
+        if self.mem_tracker:
+            self.mem_tracker.report(lvl_idx, self.platforms, self.enemies)
+
+    def start(self):
+        self.state = "PLAY"
+        self.level = 1
+        self.player.lives = 3
+        self.player.score = 0
+        self.player.coins = 0
+        self.load_level(self.level)
+
+    def restart(self):
+        self.load_level(self.level)
+
+    def save(self):
+        self.quick_save = snapshot_game(self.player, self.level_data, self.roster,
+                                        self.state, self.level, self.transition_timer)
+
+    def load(self):
+        if not self.quick_save:
+            return
+        data, roster, self.state, self.level, self.transition_timer = \
+            restore_snapshot(self.quick_save, self.player)
+        if data is not self.level_data:
+            self.install_level(data, roster)
+        particles.clear()
+        audio.play_music(self.current_theme)
+
+    def update(self, keys):
+        player = self.player
+        player.update(self.platforms, self.enemies, self.hazards, keys, self.goal_rect, self.current_theme)
+        self.enemies.update(self.platforms)
+        active_blocks.update()
+        particles.update()
+        self.camera.update(player)
+
+        if self.goal_rect and player.rect.colliderect(self.goal_rect):
+            self.complete_level()
+
+        if player.dead:
+            self.state = "TRANSITION"
+            self.transition_timer = 120
+
+    def complete_level(self):
+        player = self.player
+        if self.current_theme == "castle":
+            for e in self.enemies:
+                if isinstance(e, Bowser):
+                    e.die() 
+            player.score += 5000
+        else:
+            player.score += 1000 + (player.lives * 500)
+        audio.stop_music()
+        audio.play("clear")
+        self.state = "TRANSITION"
+        self.transition_timer = 120
+        self.level += 1
+        if self.level > 32:
+            self.level = 32 
+
+    def update_transition(self):
+        particles.update()
+        self.transition_timer -= 1
+        if self.transition_timer <= 0:
+            if self.player.lives <= 0:
+                self.state = "MENU"
+            elif self.level > 32:
+                self.state = "MENU"
+            else:
+                self.player.dead = False 
+                self.load_level(self.level) 
+                self.state = "PLAY"
 
-    load_level(level)
+# -------------------------------------------------
+# MEMORY ACCOUNTING
+# -------------------------------------------------
+def surface_bytes(surf):
+    # Pixel buffers live in SDL, so tracemalloc never sees them
+    return surf.get_pitch() * surf.get_height()
+
+class MemoryTracker:
+    """
+    Reports what each load_level leaves behind: per-type sprite counts for the
+    new level, the pixel bytes their Surfaces hold, how many Entity objects
+    are still alive process-wide (stale levels show up here) and the
+    tracemalloc delta since the previous report.
+    """
+    def __init__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        gc.collect()
+        self.last = tracemalloc.get_traced_memory()[0]
+
+    def report(self, lvl_idx, platforms, enemies):
+        gc.collect()
+        counts = {}
+        surf_total = 0
+        for spr in list(platforms) + list(enemies):
+            name = type(spr).__name__
+            counts[name] = counts.get(name, 0) + 1
+            surf_total += surface_bytes(spr.image)
+        live_entities = sum(1 for o in gc.get_objects() if isinstance(o, Entity))
+        current = tracemalloc.get_traced_memory()[0]
+        delta = current - self.last
+        self.last = current
+
+        w_num = (lvl_idx - 1) // 4 + 1
+        l_num = (lvl_idx - 1) % 4 + 1
+        count_txt = " ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+        print(f"[mem] {w_num}-{l_num}: {count_txt} surfaces={surf_total / 1024:.1f} KB "
+              f"live_entities={live_entities} traced={current / 1024:.1f} KB ({delta / 1024:+.1f} KB)")
+        return counts, surf_total, live_entities, delta
+
+def soak_levels(cycles=10, threshold_kb=512):
+    """
+    Plays through all 32 levels `cycles` times on a headless GameSession,
+    going through the same transitions as main(): restart, quick-save, death
+    reload, quick-load and course clear. Each cycle reseeds the RNG, so every
+    cycle builds identical levels; it fails if traced memory retained by the
+    session grows past threshold_kb or more Entity objects stay alive than
+    after the first (warm-up) cycle.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    game = GameSession()
+    idle = collections.defaultdict(bool)
+    baseline = baseline_entities = None
+    for cycle in range(cycles):
+        random.seed(0)
+        game.start()
+        for lvl_idx in range(1, 33):
+            game.restart()
+            for _ in range(30):
+                game.update(idle)
+            game.save()
+
+            # Death: wait out the transition, which reloads the level
+            game.player.die()
+            game.update(idle)
+            while game.state == "TRANSITION":
+                game.update_transition()
+
+            # Quick-load back into the pre-death level objects
+            game.load()
+
+            # Course clear: transition loads the next level
+            game.complete_level()
+            while game.state == "TRANSITION":
+                game.update_transition()
+
+        gc.collect()
+        current = tracemalloc.get_traced_memory()[0]
+        live_entities = sum(1 for o in gc.get_objects() if isinstance(o, Entity))
+        if baseline is None:
+            baseline, baseline_entities = current, live_entities
+        growth = current - baseline
+        print(f"[soak] cycle {cycle + 1}/{cycles}: traced={current / 1024:.1f} KB "
+              f"growth={growth / 1024:+.1f} KB live_entities={live_entities}")
+        if live_entities > baseline_entities or growth > threshold_kb * 1024:
+            print(f"[soak] FAIL: retained memory over {threshold_kb} KB or entities leaked")
+            return False
+    print("[soak] OK")
+    return True
+
+# -------------------------------------------------
+# GAME LOOPS & STATES
+# -------------------------------------------------
+def draw_world(screen, game):
+    camera = game.camera
+    screen.fill(game.bg_color)
+
+    for p in game.platforms:
+        r = camera.apply(p)
+        if r.right < 0 or r.left > SCREEN_WIDTH: continue
+        pygame.draw.rect(screen, p.color, r)
+        pygame.draw.rect(screen, (0,0,0), r, 1)
+        if p.type == "question":
+             pygame.draw.rect(screen, (255,200,200), (r.x+5, r.y+5, 5, 5))
+
+    for e in game.enemies:
+        e.draw(screen, camera)
+
+    for h in game.hazards:
+        hr = camera.apply_rect(h)
+        pygame.draw.rect(screen, LAVA_RED, hr)
+
+    if game.goal_rect:
+        gr = camera.apply_rect(game.goal_rect)
+        if game.current_theme == "castle": 
+            pygame.draw.rect(screen, GOLD, gr)
+        else: 
+            pygame.draw.rect(screen, (100, 100, 100), (gr.x + 4, gr.y, 2, gr.height)) 
+            pygame.draw.rect(screen, (0, 255, 0), (gr.x + 6, gr.y + 20, 30, 20)) 
+
+    game.player.draw(screen, camera)
+    particles.draw(screen, camera)
+
+def main(memstats=False):
+    clock = pygame.time.Clock()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    
+    # Game Variables
+    game = GameSession(MemoryTracker() if memstats else None)
+    player = game.player
+    game.load_level(game.level)
     
     # Loop Logic
     running = True
-    state = "MENU" 
-    
-    transition_timer = 0
 
     while running:
         # --- Events ---
@@ -622,22 +1212,21 @@ def main():
             if event.type == pygame.QUIT:
                 running = False
             if event.type == pygame.KEYDOWN:
-                if state == "MENU":
+                if game.state == "MENU":
                     if event.key == pygame.K_RETURN:
-                        state = "PLAY"
-                        level = 1
-                        player.lives = 3
-                        player.score = 0
-                        player.coins = 0
-                        load_level(level)
-                elif state == "PLAY":
+                        game.start()
+                elif game.state == "PLAY":
                     if event.key == pygame.K_r: 
-                         load_level(level)
+                         game.restart()
+                    elif event.key == pygame.K_F5:
+                        game.save()
+                    elif event.key == pygame.K_F9:
+                        game.load()
 
         # --- Update & Draw ---
         screen.fill(BLACK)
         
-        if state == "MENU":
+        if game.state == "MENU":
             screen.fill(SKY_BLUE)
             pygame.draw.rect(screen, GROUND_BROWN, (0, 500, 800, 100))
             
@@ -649,77 +1238,35 @@ def main():
             info = font_sm.render("Accurate 1-1 Layout | Arrows to Move, Space to Jump", True, WHITE)
             screen.blit(info, (SCREEN_WIDTH//2 - info.get_width()//2, 450))
 
-        elif state == "PLAY":
-            screen.fill(bg_color)
-            
-            player.update(platforms, enemies, hazards, keys, goal_rect, current_theme)
-            enemies.update(platforms)
-            camera.update(player)
-            
-            if goal_rect and player.rect.colliderect(goal_rect):
-                if current_theme == "castle":
-                    for e in enemies:
-                        if isinstance(e, Bowser):
-                            e.die() 
-                    player.score += 5000
-                else:
-                    player.score += 1000 + (player.lives * 500)
-                state = "TRANSITION"
-                transition_timer = 120
-                level += 1
-                if level > 32:
-                    level = 32 
-            
-            if player.dead:
-                state = "TRANSITION"
-                transition_timer = 120
-
-            # Draw World
-            for p in platforms:
-                r = camera.apply(p)
-                if r.right < 0 or r.left > SCREEN_WIDTH: continue
-                pygame.draw.rect(screen, p.color, r)
-                pygame.draw.rect(screen, (0,0,0), r, 1)
-                if p.type == "question":
-                     pygame.draw.rect(screen, (255,200,200), (r.x+5, r.y+5, 5, 5))
-
-            for e in enemies:
-                e.draw(screen, camera)
-
-            for h in hazards:
-                hr = camera.apply_rect(h)
-                pygame.draw.rect(screen, LAVA_RED, hr)
-
-            if goal_rect:
-                gr = camera.apply_rect(goal_rect)
-                if current_theme == "castle": 
-                    pygame.draw.rect(screen, GOLD, gr)
-                else: 
-                    pygame.draw.rect(screen, (100, 100, 100), (gr.x + 4, gr.y, 2, gr.height)) 
-                    pygame.draw.rect(screen, (0, 255, 0), (gr.x + 6, gr.y + 20, 30, 20)) 
-
-            player.draw(screen, camera)
+        elif game.state == "PLAY":
+            game.update(keys)
+            draw_world(screen, game)
             
             # HUD
-            w_num = (level - 1) // 4 + 1
-            l_num = (level - 1) % 4 + 1
+            w_num = (game.level - 1) // 4 + 1
+            l_num = (game.level - 1) % 4 + 1
             hud_txt = f"WORLD {w_num}-{l_num}   LIVES x{player.lives}   COINS x{player.coins}   SCORE {player.score}"
             screen.blit(font_sm.render(hud_txt, True, WHITE), (20, 20))
 
-        elif state == "TRANSITION":
+        elif game.state == "TRANSITION" and player.dead and game.transition_timer > 120 - DEATH_FREEZE_FRAMES:
+            # Hold the frozen level on screen so death effects play over it
+            draw_world(screen, game)
+            game.update_transition()
+
+        elif game.state == "TRANSITION":
             screen.fill(BLACK)
             
             if player.lives <= 0:
                 txt = font_lg.render("GAME OVER", True, (200, 0, 0))
                 screen.blit(txt, (SCREEN_WIDTH//2 - txt.get_width()//2, 250))
-            elif level > 32:
+            elif game.level > 32:
                 txt = font_lg.render("YOU WIN!", True, GOLD)
                 screen.blit(txt, (SCREEN_WIDTH//2 - txt.get_width()//2, 250))
                 sub = font_md.render("Princess Saved!", True, WHITE)
                 screen.blit(sub, (SCREEN_WIDTH//2 - sub.get_width()//2, 350))
             else:
-                w_num = (level - 1) // 4 + 1
-                l_num = (level - 1) % 4 + 1
+                w_num = (game.level - 1) // 4 + 1
+                l_num = (game.level - 1) % 4 + 1
                 
                 if player.dead:
                     status = f"x {player.lives}"
@@ -736,19 +1283,7 @@ def main():
                 
                 pygame.draw.rect(screen, icon_color, (SCREEN_WIDTH//2 - 20, 250, 40, 40))
 
-            transition_timer -= 1
-            if transition_timer <= 0:
-                if player.lives <= 0:
-                    state = "MENU"
-                elif level > 32:
-                    state = "MENU"
-                else:
-                    if player.dead:
-                        player.dead = False 
-                        load_level(level) 
-                    else:
-                        load_level(level) 
-                    state = "PLAY"
+            game.update_transition()
 
         pygame.display.flip()
         clock.tick(FPS)
@@ -756,5 +1291,175 @@ def main():
     pygame.quit()
     sys.exit()
 
+# -------------------------------------------------
+# BENCHMARKS
+# -------------------------------------------------
+def bench_particles(live=PARTICLE_CAPACITY, frames=600):
+    """
+    Keeps `live` particles alive for `frames` frames and reports the average
+    update and draw cost against the 60 FPS frame budget.
+    """
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+    pool = ParticlePool(max(live, PARTICLE_CAPACITY))
+    kinds = (P_COIN, P_DEBRIS, P_PUFF, P_SPARK, P_HIT)
+    upd = drw = 0.0
+    gc0 = gc.get_stats()[0]["collections"]
+    for f in range(frames):
+        while pool.count < live:
+            pool.emit(kinds[pool.count % len(kinds)], random.randint(0, SCREEN_WIDTH),
+                      random.randint(0, SCREEN_HEIGHT), min(16, live - pool.count))
+        t0 = time.perf_counter()
+        pool.update()
+        t1 = time.perf_counter()
+        pool.draw(screen, camera)
+        t2 = time.perf_counter()
+        upd += t1 - t0
+        drw += t2 - t1
+    gc_runs = gc.get_stats()[0]["collections"] - gc0
+    budget = 1000.0 / FPS
+    upd_ms = upd * 1000 / frames
+    drw_ms = drw * 1000 / frames
+    print(f"particles={live} frames={frames}")
+    print(f"update {upd_ms:.3f} ms  draw {drw_ms:.3f} ms  "
+          f"total {upd_ms + drw_ms:.3f} ms ({(upd_ms + drw_ms) / budget:.0%} of {budget:.2f} ms budget)")
+    print(f"gen-0 gc collections: {gc_runs} ({gc_runs / frames:.2f} per frame)")
+
+def bench_snapshot(trials=2000):
+    """
+    Times snapshot_game/restore_snapshot on the largest of the 32 levels
+    after hitting a few blocks and letting enemies move.
+    """
+    random.seed(0)
+    best = None
+    for lvl_idx in range(1, 33):
+        data = generate_level_data(lvl_idx)
+        if best is None or len(data[0]) > len(best[1][0]):
+            best = (lvl_idx, data)
+    lvl_idx, data = best
+    platforms, enemies = data[0], data[1]
+    roster = list(enemies)
+    player = Player(100, 100)
+    active_blocks.clear()
+    for b in [b for b in platforms if b.type in ("question", "normal")][:8]:
+        b.hit()
+    for _ in range(30):
+        enemies.update(platforms)
+        active_blocks.update()
+    particles.clear()
+
+    t0 = time.perf_counter()
+    for _ in range(trials):
+        snap = snapshot_game(player, data, roster, "PLAY", lvl_idx, 0)
+    t1 = time.perf_counter()
+    for _ in range(trials):
+        restore_snapshot(snap, player)
+    t2 = time.perf_counter()
+    w_num = (lvl_idx - 1) // 4 + 1
+    l_num = (lvl_idx - 1) % 4 + 1
+    print(f"level {w_num}-{l_num}: {len(platforms)} blocks, {len(roster)} enemies, "
+          f"{len(active_blocks.touched)} touched blocks")
+    print(f"snapshot {(t1 - t0) * 1e6 / trials:.1f} us  restore {(t2 - t1) * 1e6 / trials:.1f} us")
+
+def check_replay(levels=range(1, 9), ticks=600):
+    """
+    Saves at the start of each level, plays `ticks` frames of scripted
+    input, quick-loads and plays the same frames again. Rollback depends on
+    both runs ending in an identical state, enemy group order included.
+    Returns False on the first level that diverges.
+    """
+    game = GameSession()
+    ok = True
+    for lvl_idx in levels:
+        random.seed(lvl_idx)
+        game.start()
+        game.level = lvl_idx
+        game.restart()
+        particles.clear()
+        game.save()
+        saved_order = [game.roster.index(e) for e in game.enemies]
+
+        runs = []
+        restored = True
+        for _ in range(2):
+            frames = 0
+            for tick in range(ticks):
+                if game.state != "PLAY":
+                    break
+                keys = collections.defaultdict(bool)
+                keys[pygame.K_RIGHT] = tick % 200 < 170
+                keys[pygame.K_SPACE] = tick % 45 < 12
+                game.update(keys)
+                frames += 1
+            snap = snapshot_game(game.player, game.level_data, game.roster,
+                                 game.state, game.level, game.transition_timer)
+            runs.append((frames, snap, [game.roster.index(e) for e in game.enemies]))
+            game.load()
+            restored = restored and [game.roster.index(e) for e in game.enemies] == saved_order
+
+        (frames, snap, order), (frames2, snap2, order2) = runs
+        stomped = sum(1 for e in snap[4] if not e[1])
+        same = restored and frames == frames2 and snap == snap2 and order == order2
+        w_num = (lvl_idx - 1) // 4 + 1
+        l_num = (lvl_idx - 1) % 4 + 1
+        print(f"[replay] {w_num}-{l_num}: {len(game.roster)} enemies, {stomped} gone, "
+              f"{frames} frames, order {order2}: {'OK' if same else 'DIVERGED'}")
+        ok = ok and same
+    return ok
+
+def bench_audio(trials=100):
+    """
+    Measures input-to-sound latency. Each trial posts a KEYDOWN, dispatches
+    a silent 2 ms probe on the voice channel when the event is read, then
+    polls get_busy() until the mixer has consumed it. Because the probe is
+    shorter than one mixer buffer, that time (minus the probe length) is
+    how long a sound waits before the mixer picks it up. The device still
+    holds one buffer of output after that; its size is reported from the
+    requested AUDIO_BUFFER, since get_init() does not expose what SDL chose.
+    """
+    if not audio.enabled:
+        print("audio: mixer not available")
+        return
+    freq, size, chans = pygame.mixer.get_init()
+    probe_ms = 2.0
+    probe = audio.synth([(1000, 1000, probe_ms / 1000, "square")], 0.0)
+    channel = audio.voice_channel
+    dispatch = []
+    pickup = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+        for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                channel.play(probe)
+        t1 = time.perf_counter()
+        while channel.get_busy() and time.perf_counter() - t1 < 1.0:
+            time.sleep(0.0001)
+        t2 = time.perf_counter()
+        dispatch.append((t1 - t0) * 1000)
+        pickup.append(max(0.0, (t2 - t0) * 1000 - probe_ms))
+    dispatch.sort()
+    pickup.sort()
+    buffer_ms = AUDIO_BUFFER * 1000.0 / freq
+    med = len(pickup) // 2
+    print(f"mixer {freq} Hz, {abs(size)}-bit, {chans} ch, requested buffer {AUDIO_BUFFER} samples")
+    print(f"sound bank: {len(audio.bank)} effects, {len(audio.music)} music loops")
+    print(f"event->play dispatch: median {dispatch[med]:.3f} ms  max {dispatch[-1]:.3f} ms")
+    print(f"event->mixer pickup (measured): median {pickup[med]:.2f} ms  max {pickup[-1]:.2f} ms")
+    print(f"device output buffer (requested): {buffer_ms:.2f} ms")
+    print(f"input-to-sound: median {pickup[med] + buffer_ms:.2f} ms "
+          f"(plus up to one frame, {1000.0 / FPS:.2f} ms, of input polling)")
+
 if __name__ == "__main__":
-    main()
+    if "--bench-particles" in sys.argv:
+        bench_particles()
+    elif "--bench-snapshot" in sys.argv:
+        bench_snapshot()
+    elif "--bench-audio" in sys.argv:
+        bench_audio()
+    elif "--check-replay" in sys.argv:
+        sys.exit(0 if check_replay() else 1)
+    elif "--soak" in sys.argv:
+        sys.exit(0 if soak_levels() else 1)
+    else:
+        main(memstats="--memstats" in sys.argv)